@@ -1,30 +1,52 @@
 import os
-import json
+import re
 import asyncio
 import sys
 import io
+import base64
+import shutil
+import time
+import zlib
+import heapq
 import logging
+import hashlib
+import functools
+import weakref
+import threading
+import traceback
+import orjson
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # Agno imports
-from agno.agent import Agent
-from agno.models.google import Gemini
 from agno.tools import tool
 
 # Browser-use imports
 from langchain_google_genai import ChatGoogleGenerativeAI
 import browser_use
 from browser_use import Browser, BrowserConfig, Controller, ActionResult
+from browser_use.agent.views import AgentHistory, AgentHistoryList
 from browser_use.browser.context import BrowserContextConfig
 
+from plan_cache import PlanCache, fingerprint, page_fingerprint
+from screenshot_files import write_screenshot_file
+
+# Optional: with Pillow installed, browser-use's PNG step screenshots are
+# re-encoded as WebP, which is several times smaller
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
 # Load environment variables
 load_dotenv()
 
@@ -32,7 +54,8 @@ load_dotenv()
 app = FastAPI(
     title="Website Testing Agent API",
     description="AI-powered website testing and automation API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware for frontend integration
@@ -49,14 +72,62 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     print("ERROR: GEMINI_API_KEY not found in .env file or environment variables.")
 
+# Level for the per-task detailed agent log
+AGENT_LOG_LEVEL = os.getenv("AGENT_LOG_LEVEL", "INFO").upper()
+AGENT_LOG_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
 # Create operation_logs directory and serve static files
 logs_dir = Path("./operation_logs")
 screenshots_dir = logs_dir / "screenshots"
-logs_dir.mkdir(exist_ok=True)
-screenshots_dir.mkdir(exist_ok=True)
+screenshots_dir.mkdir(parents=True, exist_ok=True)
+
+# Cache of successful agent runs, replayed without LLM calls on repeat tasks
+plan_cache = PlanCache(logs_dir / "plan_cache")
+
+# Screenshots we capture ourselves don't need to be lossless; JPEG is several
+# times smaller than PNG for full-page captures
+SCREENSHOT_OPTIONS = {"type": "jpeg", "quality": 80}
+SCREENSHOT_EXT = "jpg"
+STEP_SCREENSHOT_EXT = "webp" if Image is not None else "png"
+
+class SecondClock:
+    """Current local time formatted with strftime, reformatted only when the second changes."""
+    
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._cached = (None, "")
+    
+    def __call__(self) -> str:
+        second = int(time.time())
+        cached_second, text = self._cached
+        if second != cached_second:
+            text = time.strftime(self.fmt, time.localtime(second))
+            # Single assignment so concurrent callers never see a mismatched pair
+            self._cached = (second, text)
+        return text
+
+# Timestamps for screenshot filenames and agent thought log lines
+file_timestamp = SecondClock("%Y%m%d_%H%M%S")
+log_timestamp = SecondClock("%Y-%m-%d %H:%M:%S")
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers cache screenshots forever.
+
+    Screenshot filenames are unique per task and step (agent captures also
+    carry a content hash), so a URL never points at different bytes.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
 # Mount static files for serving screenshots
-app.mount("/screenshots", StaticFiles(directory=str(screenshots_dir)), name="screenshots")
+app.mount("/screenshots", ImmutableStaticFiles(directory=str(screenshots_dir)), name="screenshots")
 
 # Pydantic models for API requests and responses
 class ScreenshotInstruction(BaseModel):
@@ -67,6 +138,8 @@ class TestInstructions(BaseModel):
     target_url: str
     task_description: str
     screenshot_instructions: List[ScreenshotInstruction]
+    enable_trace: bool = False  # Playwright trace and browser-use conversation log
+    enable_recording: bool = False  # Video recording of the browser session
 
 class TaskStatus(BaseModel):
     task_id: str
@@ -81,7 +154,7 @@ class ExecutionResult(BaseModel):
     timestamp: str
     task_details: Dict
     execution_steps: List[Dict]
-    screenshots: List[str]
+    screenshot_urls: List[str]
     error: Optional[str] = None
     log_file: Optional[str] = None
 
@@ -91,128 +164,592 @@ class AnalysisResult(BaseModel):
     recommendations: List[str]
     compliance_check: Dict
 
-# In-memory storage for task status (use Redis/DB in production)
-task_storage = {}
+def _encode_default(obj):
+    """orjson fallback: Pydantic models as dicts, anything else as a string."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    return str(obj)
+
+class TaskTable:
+    """In-memory task storage laid out column-wise.
+    
+    The fields /tasks lists live in parallel lists, so listing tasks is a zip
+    over them. Everything else (instructions, results, ...) is kept in a
+    per-task payload dict; only the `max_payloads` most recently used
+    finished tasks keep theirs.
+    """
+    
+    def __init__(self, max_payloads: int = 1000):
+        self.ids: List[str] = []
+        self.status: List[str] = []
+        self.start: List[Optional[str]] = []
+        self.end: List[Optional[str]] = []
+        self.index: Dict[str, int] = {}
+        self.payload: "OrderedDict[str, dict]" = OrderedDict()
+        self.max_payloads = max_payloads
+    
+    def create(self, task_id: str, fields: dict):
+        payload = dict(fields)
+        payload.pop("task_id", None)
+        self.index[task_id] = len(self.ids)
+        self.ids.append(task_id)
+        self.status.append(payload.pop("status", None))
+        self.start.append(payload.pop("start_time", None))
+        self.end.append(payload.pop("end_time", None))
+        self.payload[task_id] = payload
+        self._evict()
+    
+    def update(self, task_id: str, fields: dict):
+        row = self.index[task_id]
+        if "status" in fields:
+            self.status[row] = fields.pop("status")
+        if "start_time" in fields:
+            self.start[row] = fields.pop("start_time")
+        if "end_time" in fields:
+            self.end[row] = fields.pop("end_time")
+        if fields:
+            self.payload.setdefault(task_id, {}).update(fields)
+            self.payload.move_to_end(task_id)
+            self._evict()
+    
+    def get(self, task_id: str) -> Optional[dict]:
+        row = self.index.get(task_id)
+        if row is None:
+            return None
+        payload = self.payload.get(task_id)
+        if payload is not None:
+            self.payload.move_to_end(task_id)
+        return {
+            "task_id": task_id,
+            "status": self.status[row],
+            "start_time": self.start[row],
+            "end_time": self.end[row],
+            **(payload or {})
+        }
+    
+    def summaries(self) -> List[dict]:
+        return [
+            {"task_id": task_id, "status": status, "start_time": start_time, "end_time": end_time}
+            for task_id, status, start_time, end_time in zip(self.ids, self.status, self.start, self.end)
+        ]
+    
+    def _evict(self):
+        """Drop payloads of the least recently used finished tasks."""
+        excess = len(self.payload) - self.max_payloads
+        if excess <= 0:
+            return
+        finished = [
+            task_id for task_id in self.payload
+            if self.status[self.index[task_id]] in ("completed", "failed")
+        ]
+        for task_id in finished[:excess]:
+            del self.payload[task_id]
+
+class TaskStore:
+    """Task status storage.
+    
+    Kept in process memory by default. When REDIS_URL is set, each task is a
+    Redis hash (values JSON-encoded) so several uvicorn workers share state.
+    """
+    
+    SUMMARY_FIELDS = ("task_id", "status", "start_time", "end_time")
+    
+    def __init__(self, redis_url: Optional[str] = None, shards: int = 16):
+        # In memory, tasks are spread over several TaskTables by id so each
+        # table's columns and index stay small as the task count grows
+        max_payloads = int(os.getenv("MAX_TASK_PAYLOADS", "1000"))
+        self._shards = [TaskTable(max(1, max_payloads // shards)) for _ in range(shards)]
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+    
+    def _shard(self, task_id: str) -> TaskTable:
+        return self._shards[zlib.crc32(task_id.encode()) % len(self._shards)]
+    
+    async def create(self, task_id: str, fields: dict):
+        """Register a new task with its initial fields."""
+        if self._redis is None:
+            self._shard(task_id).create(task_id, fields)
+            return
+        await self._redis.hset(f"task:{task_id}", mapping={k: orjson.dumps(v, default=_encode_default) for k, v in fields.items()})
+        await self._redis.sadd("tasks", task_id)
+    
+    async def update(self, task_id: str, **fields):
+        """Set fields on an existing task."""
+        if self._redis is None:
+            self._shard(task_id).update(task_id, fields)
+            return
+        await self._redis.hset(f"task:{task_id}", mapping={k: orjson.dumps(v, default=_encode_default) for k, v in fields.items()})
+    
+    async def get(self, task_id: str) -> Optional[dict]:
+        """Get a task's fields, or None if the task doesn't exist."""
+        if self._redis is None:
+            return self._shard(task_id).get(task_id)
+        fields = await self._redis.hgetall(f"task:{task_id}")
+        return {k: orjson.loads(v) for k, v in fields.items()} if fields else None
+    
+    async def summaries(self) -> List[dict]:
+        """Get the id, status, start and end time of every task."""
+        if self._redis is None:
+            # Each shard is in creation order; merge them back into one list
+            return list(heapq.merge(*(shard.summaries() for shard in self._shards), key=lambda task: task["start_time"] or ""))
+        summaries = []
+        for task_id in sorted(await self._redis.smembers("tasks")):
+            values = await self._redis.hmget(f"task:{task_id}", self.SUMMARY_FIELDS)
+            if values[0] is not None:
+                summaries.append({
+                    field: orjson.loads(value) if value is not None else None
+                    for field, value in zip(self.SUMMARY_FIELDS, values)
+                })
+        return summaries
+
+# Task status storage; set REDIS_URL to share it across uvicorn workers
+task_storage = TaskStore(os.getenv("REDIS_URL"))
+
+# Queue of pending browser tasks, drained by a fixed pool of workers so that
+# concurrent requests don't each launch their own Chromium on the event loop.
+# Overlapping tasks are safe: stdout/stderr capture is routed per task (ContextTee)
+MAX_CONCURRENT_TASKS = int(os.getenv("MAX_CONCURRENT_TASKS", "2"))
+task_queue: asyncio.Queue = asyncio.Queue()
+
+def get_gemini_llm() -> ChatGoogleGenerativeAI:
+    """Gemini LLM shared by every browser agent, so its client and connections are reused."""
+    if getattr(app.state, "gemini_llm", None) is None:
+        app.state.gemini_llm = ChatGoogleGenerativeAI(
+            model="gemini-2.0-flash",
+            google_api_key=GEMINI_API_KEY,
+            temperature=0.1
+        )
+    return app.state.gemini_llm
+
+@functools.lru_cache(maxsize=None)
+def build_browser_config() -> BrowserConfig:
+    """Browser settings shared by every pooled browser; built once."""
+    # Configure browser settings for better screenshot capture
+    return BrowserConfig(
+        headless=False,  # Run with head for better compatibility
+        disable_security=True,  # Disable security features for testing
+        keep_alive=True,
+        extra_browser_args=[
+            "--disable-blink-features=AutomationControlled",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-web-security",
+            "--disable-features=VizDisplayCompositor",
+            "--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "--window-size=1920,1080",
+            "--disable-extensions",
+            "--disable-plugins",
+            # Remove --disable-images and --disable-javascript for better screenshots
+        ]
+    )
+
+@functools.lru_cache(maxsize=4)
+def build_context_config(enable_trace: bool, enable_recording: bool) -> BrowserContextConfig:
+    """Per-task browser context settings; one shared instance per trace/recording combination."""
+    return BrowserContextConfig(
+        window_size={"width": 1920, "height": 1080},
+        wait_for_network_idle_page_load_time=3.0,
+        highlight_elements=True,
+        viewport_expansion=500,
+        # Traces and recordings are opt-in; they write many MB per run
+        save_recording_path=str(logs_dir / "recordings") if enable_recording else None,
+        trace_path=str(logs_dir / "traces") if enable_trace else None
+    )
+
+class BrowserPool:
+    """Pool of long-lived browsers; each task gets a fresh context on one of them."""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._browsers: List[Browser] = []
+    
+    def _new_browser(self) -> Browser:
+        browser = Browser(config=build_browser_config())
+        self._browsers.append(browser)
+        return browser
+    
+    async def start(self):
+        """Pre-launch the pooled browsers so the first tasks skip Chromium startup."""
+        while len(self._browsers) < self.size:
+            browser = self._new_browser()
+            try:
+                await browser.get_playwright_browser()
+            except Exception as e:
+                print(f"⚠️ Browser warm-up failed: {e}")
+            self._idle.put_nowait(browser)
+    
+    async def acquire(self) -> Browser:
+        """Get an idle browser, launching a new one while below pool size."""
+        if self._idle.empty() and len(self._browsers) < self.size:
+            return self._new_browser()
+        return await self._idle.get()
+    
+    async def release(self, browser: Browser, healthy: bool = True):
+        """Return a browser to the pool, or drop it if it is no longer usable."""
+        if healthy:
+            self._idle.put_nowait(browser)
+            return
+        self._browsers.remove(browser)
+        try:
+            await self._shutdown(browser)
+        except Exception as e:
+            print(f"⚠️ Error closing browser: {e}")
+    
+    @staticmethod
+    async def _shutdown(browser: Browser):
+        """Close Chromium and stop the Playwright driver; Browser.close() skips both with keep_alive."""
+        if browser.playwright_browser:
+            await browser.playwright_browser.close()
+            browser.playwright_browser = None
+        if browser.playwright:
+            await browser.playwright.stop()
+            browser.playwright = None
+    
+    async def close(self):
+        """Close every pooled browser."""
+        for browser in self._browsers:
+            try:
+                await self._shutdown(browser)
+            except Exception as e:
+                print(f"⚠️ Error closing browser: {e}")
+        self._browsers.clear()
+        self._idle = asyncio.Queue()
+
+browser_pool = BrowserPool(MAX_CONCURRENT_TASKS)
+
+class ScreenshotWriter:
+    """Background writer for screenshots taken during a run.
+    
+    Captures are queued and return at once; a single writer task drains
+    whatever has accumulated and writes it in one thread hop. Each capture
+    gets a future that resolves to whether its file was written.
+    """
+    
+    log = logging.getLogger("agent.screenshots")
+    
+    BATCH_SIZE = 16
+    
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    def write(self, path: Path, data: bytes) -> asyncio.Future:
+        """Queue a screenshot to be written to path."""
+        written = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((path, data, written))
+        return written
+    
+    async def join(self):
+        """Wait until every queued screenshot is on disk."""
+        await self._queue.join()
+    
+    @classmethod
+    def _write_batch(cls, batch) -> List[bool]:
+        outcomes = []
+        for path, data, _ in batch:
+            try:
+                write_screenshot_file(path, data)
+                outcomes.append(True)
+            except Exception as e:
+                cls.log.error("Error writing screenshot %s: %s", path.name, e)
+                outcomes.append(False)
+        return outcomes
+    
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            outcomes = [False] * len(batch)
+            try:
+                outcomes = await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                self.log.error("Error writing %d screenshots: %s", len(batch), e)
+            finally:
+                for (_, _, written), outcome in zip(batch, outcomes):
+                    if not written.done():
+                        written.set_result(outcome)
+                    self._queue.task_done()
+    
+    async def close(self):
+        """Write out anything still queued and stop the writer."""
+        if self._task is None:
+            return
+        await self.join()
+        self._task.cancel()
+        self._task = None
+
+screenshot_writer = ScreenshotWriter()
+
+# Attribute names probed on step objects of unknown type
+ACTION_ATTRS = ('model_output', 'action', 'input', 'query', 'tool_calls')
+RESULT_ATTRS = ('result', 'output', 'response', 'content')
+TIMESTAMP_ATTRS = ('timestamp', 'time', 'created_at')
+SCREENSHOT_ATTRS = ('screenshot', 'image', 'screen_capture', 'page_screenshot')
+
+DATA_URI_RE = re.compile(r'data:image/[\w.+-]+;base64,')
+
+def _first_attr(step, attrs):
+    """Return the first truthy attribute of step among attrs."""
+    return next((value for value in (getattr(step, attr, None) for attr in attrs) if value), None)
+
+def extract_agent_history_step(step) -> dict:
+    """Extract step details from a browser-use AgentHistory."""
+    metadata = getattr(step, 'metadata', None)
+    state = step.state
+    screenshot = None
+    if state is not None and state.screenshot:
+        # browser-use stores screenshots as raw base64 PNG
+        screenshot = base64.b64decode(state.screenshot)
+    return {
+        "action": str(step.model_output) if step.model_output else None,
+        "result": str(step.result) if step.result else None,
+        "timestamp": datetime.fromtimestamp(metadata.step_start_time).isoformat() if metadata else None,
+        "screenshot": screenshot
+    }
+
+def extract_tuple_step(step) -> dict:
+    """Extract step details from a (model_output, result, ...) tuple."""
+    return {
+        "action": str(step[0]) if len(step) >= 2 and step[0] else None,
+        "result": str(step[1]) if len(step) >= 2 and step[1] else None,
+        "timestamp": None,
+        "screenshot": next((item.screenshot for item in step if getattr(item, 'screenshot', None)), None)
+    }
+
+def extract_generic_step(step) -> dict:
+    """Extract step details from an object of unknown type by probing common attribute names."""
+    action = _first_attr(step, ACTION_ATTRS)
+    result = _first_attr(step, RESULT_ATTRS)
+    step_time = _first_attr(step, TIMESTAMP_ATTRS)
+    if step_time is not None:
+        step_time = step_time.isoformat() if hasattr(step_time, 'isoformat') else str(step_time)
+    return {
+        "action": str(action) if action else None,
+        "result": str(result) if result else None,
+        "timestamp": step_time,
+        "screenshot": _first_attr(step, SCREENSHOT_ATTRS)
+    }
+
+# Concurrent step extract/decode/write jobs in save_execution_results
+STEP_WORKERS = 4
+
+# Per-step fields returned by /task-results; the rest stay in the execution log
+LEAN_STEP_FIELDS = ("step_number", "action", "result", "timestamp", "screenshot_url")
+
+# Step extractors by concrete step type
+STEP_EXTRACTORS = {
+    AgentHistory: extract_agent_history_step,
+    tuple: extract_tuple_step,
+}
+
+async def _page_from_browser_context(browser_agent):
+    return await browser_agent.browser_context.get_current_page()
+
+async def _page_from_browser(browser_agent):
+    return await browser_agent.browser.get_current_page()
+
+async def _first_page_of_browser_context(browser_agent):
+    pages = browser_agent.browser.browser_context.pages
+    return pages[0] if pages else None
+
+async def _first_page_of_private_context(browser_agent):
+    pages = browser_agent.browser._browser_context.pages
+    return pages[0] if pages else None
+
+# Ways to reach the agent's current page; raced, earlier ones win ties
+PAGE_PROBE_TIMEOUT = 2.0
+PAGE_ACCESSORS = (
+    ("browser_context", _page_from_browser_context),
+    ("get_current_page", _page_from_browser),
+    ("browser.browser_context", _first_page_of_browser_context),
+    ("_browser_context", _first_page_of_private_context),
+)
+
+class RingSink:
+    """Write-only text sink that keeps just the last `capacity` bytes written.
+
+    The full output already goes to the stdout/stderr log files; this only
+    holds the tail that gets copied into the detailed agent log.
+    """
+
+    def __init__(self, capacity: int = 1 << 20):
+        self._buf = bytearray(capacity)
+        self._capacity = capacity
+        self._head = 0
+        self._full = False
+
+    def write(self, text: str) -> int:
+        data = text.encode('utf-8', 'replace')
+        size = len(data)
+        if size >= self._capacity:
+            self._buf[:] = data[-self._capacity:]
+            self._head = 0
+            self._full = True
+            return len(text)
+
+        end = self._head + size
+        if end <= self._capacity:
+            self._buf[self._head:end] = data
+        else:
+            split = self._capacity - self._head
+            self._buf[self._head:] = data[:split]
+            self._buf[:size - split] = data[split:]
+        if end >= self._capacity:
+            self._full = True
+        self._head = end % self._capacity
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def views(self) -> List[memoryview]:
+        """Buffered bytes in write order, without copying."""
+        view = memoryview(self._buf)
+        if self._full:
+            return [view[self._head:], view[:self._head]]
+        return [view[:self._head]]
+
+    def dump_to(self, stream):
+        """Append the buffered output to a file stream with a single write."""
+        stream.flush()
+        if hasattr(os, "writev"):
+            os.writev(stream.fileno(), [*self.views(), b"\n"])
+            return
+        # No writev on Windows
+        for view in self.views():
+            stream.buffer.write(bytes(view))
+        stream.buffer.write(b"\n")
+        stream.buffer.flush()
+
+class TaskOutput:
+    """One task's share of stdout or stderr: a tail buffer plus its own log file."""
+    
+    def __init__(self, log_path: Path):
+        # Keep the last 1 MiB for the detailed agent log
+        self.capture = RingSink(1 << 20)
+        # Open the log file once with a 64 KiB buffer instead of per write
+        self.log_fh = open(log_path, 'a', encoding='utf-8', buffering=1 << 16)
+    
+    def write(self, text: str):
+        # Threads the task started may still print after it has finished
+        if self.log_fh.closed:
+            return
+        self.capture.write(text)
+        self.log_fh.write(text)
+    
+    def flush(self):
+        if self.log_fh.closed:
+            return
+        self.capture.flush()
+        self.log_fh.flush()
+    
+    def close(self):
+        """Flush and close the log file handle."""
+        if not self.log_fh.closed:
+            self.log_fh.flush()
+            self.log_fh.close()
+
+# The TaskOutput of the task running in the current context, if any
+task_stdout: ContextVar[Optional[TaskOutput]] = ContextVar("task_stdout", default=None)
+task_stderr: ContextVar[Optional[TaskOutput]] = ContextVar("task_stderr", default=None)
+
+class ContextTee:
+    """Process-wide stdout/stderr that also copies writes to the current task's output.
+    
+    Installed once, so concurrent tasks never swap sys.stdout under each
+    other; asyncio tasks and to_thread jobs inherit the task's context.
+    """
+    
+    def __init__(self, original, current: ContextVar):
+        self.original = original
+        self.current = current
+    
+    def write(self, text):
+        written = self.original.write(text)
+        output = self.current.get()
+        if output is not None:
+            output.write(text)
+        return written
+    
+    def flush(self):
+        self.original.flush()
+        output = self.current.get()
+        if output is not None:
+            output.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+def install_output_tees():
+    """Route stdout/stderr through ContextTee; safe to call more than once."""
+    if not isinstance(sys.stdout, ContextTee):
+        sys.stdout = ContextTee(sys.stdout, task_stdout)
+    if not isinstance(sys.stderr, ContextTee):
+        sys.stderr = ContextTee(sys.stderr, task_stderr)
 
 class BrowserExecutor:
     """Direct browser automation executor using browser-use library."""
     
     def __init__(self):
-        self.logs_dir = Path("./operation_logs")
-        self.screenshots_dir = Path("./operation_logs/screenshots")
-        self.logs_dir.mkdir(exist_ok=True)
-        self.screenshots_dir.mkdir(exist_ok=True)
+        # Both directories are created once at module import
+        self.logs_dir = logs_dir
+        self.screenshots_dir = screenshots_dir
+        # Replaced by the per-task logger in execute_task
+        self.logger = logging.getLogger("agent")
+        # Page accessor that last produced a screenshot; tried first next time
+        self._page_accessor = None
         
     def setup_detailed_logging(self, task_id: str):
         """Setup comprehensive logging for the agent execution."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         log_file_path = self.logs_dir / f"detailed_agent_log_{task_id}_{timestamp}.txt"
         
-        # Create a custom logger
-        logger = logging.getLogger(f"agent_{task_id}")
-        logger.setLevel(logging.DEBUG)
-        
-        # Remove any existing handlers
-        for handler in logger.handlers[:]:
-            logger.removeHandler(handler)
+        # Create a custom logger; set AGENT_LOG_LEVEL=DEBUG for per-step detail.
+        # It is built directly rather than via logging.getLogger so that it
+        # isn't kept in logging's registry for the life of the process
+        logger = logging.Logger(f"agent_{task_id}", AGENT_LOG_LEVEL)
+        logger.parent = logging.getLogger("agent")
         
         # Create file handler
         file_handler = logging.FileHandler(log_file_path, mode='w', encoding='utf-8')
         file_handler.setLevel(logging.DEBUG)
-        
-        # Create formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(AGENT_LOG_FORMATTER)
         logger.addHandler(file_handler)
         
         return logger, log_file_path
     
     def capture_stdout_stderr(self, task_id: str):
-        """Capture stdout and stderr to log everything the agent outputs."""
+        """Capture this task's stdout and stderr to log everything the agent outputs."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         stdout_log_path = self.logs_dir / f"agent_stdout_{task_id}_{timestamp}.txt"
         stderr_log_path = self.logs_dir / f"agent_stderr_{task_id}_{timestamp}.txt"
         
-        # Backup original stdout/stderr
-        original_stdout = sys.stdout
-        original_stderr = sys.stderr
-        
-        # Create file objects for capturing output
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
-        
-        # Custom stdout/stderr that writes to both original and capture
-        class TeeOutput:
-            def __init__(self, original, capture, log_file):
-                self.original = original
-                self.capture = capture
-                self.log_file = log_file
-                
-            def write(self, text):
-                self.original.write(text)
-                self.capture.write(text)
-                # Also write to file immediately
-                with open(self.log_file, 'a', encoding='utf-8') as f:
-                    f.write(text)
-                    f.flush()
-                    
-            def flush(self):
-                self.original.flush()
-                self.capture.flush()
+        install_output_tees()
+        stdout_output = TaskOutput(stdout_log_path)
+        stderr_output = TaskOutput(stderr_log_path)
+        tokens = (task_stdout.set(stdout_output), task_stderr.set(stderr_output))
         
-        # Redirect stdout and stderr
-        sys.stdout = TeeOutput(original_stdout, stdout_capture, stdout_log_path)
-        sys.stderr = TeeOutput(original_stderr, stderr_capture, stderr_log_path)
-        
-        return original_stdout, original_stderr, stdout_capture, stderr_capture, stdout_log_path, stderr_log_path
+        return stdout_output, stderr_output, tokens, stdout_log_path, stderr_log_path
     
-    async def create_browser_agent(self, task: str, task_id: str = None):
+    async def create_browser_agent(self, task: str, task_id: str = None, enable_trace: bool = False, enable_recording: bool = False):
         """Create and configure a browser-use agent with Gemini 2.0 Flash."""
         try:
             if not GEMINI_API_KEY:
                 raise ValueError("GEMINI_API_KEY not configured")
                 
-            # Initialize Gemini LLM for browser-use
-            gemini_llm = ChatGoogleGenerativeAI(
-                model="gemini-2.0-flash",
-                google_api_key=GEMINI_API_KEY,
-                temperature=0.1
-            )
-            
-            # Configure browser settings for better screenshot capture
-            browser_config = BrowserConfig(
-                headless=False,  # Run with head for better compatibility
-                disable_security=True,  # Disable security features for testing
-                keep_alive=True,
-                extra_browser_args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--no-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-web-security",
-                    "--disable-features=VizDisplayCompositor",
-                    "--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                    "--window-size=1920,1080",
-                    "--disable-extensions",
-                    "--disable-plugins",
-                    # Remove --disable-images and --disable-javascript for better screenshots
-                ]
-            )
+            # Shared Gemini LLM for browser-use
+            gemini_llm = get_gemini_llm()
             
             # Configure browser context for better screenshot handling
-            context_config = BrowserContextConfig(
-                window_size={"width": 1920, "height": 1080},
-                wait_for_network_idle_page_load_time=3.0,
-                highlight_elements=True,
-                viewport_expansion=500,
-                save_recording_path=str(self.logs_dir / "recordings"),
-                trace_path=str(self.logs_dir / "traces")
-            )
-            
-            # Create browser with config
-            browser = Browser(config=browser_config, context_config=context_config)
+            context_config = build_context_config(enable_trace, enable_recording)
             
             # Create custom controller for logging functions
             controller = Controller()
@@ -240,15 +777,16 @@ class BrowserExecutor:
             async def take_screenshot_now(description: str, page) -> ActionResult:
                 """Take a screenshot of current browser state."""
                 try:
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    screenshot_filename = f"{task_id}_agent_action_{timestamp}.png"
-                    screenshot_path = agent_logger.screenshots_dir / screenshot_filename
-                    screenshot_url = f"/screenshots/{screenshot_filename}"
-                    
                     # Use the page parameter injected by Browser Use framework
-                    screenshot_data = await page.screenshot()
-                    with open(screenshot_path, 'wb') as f:
-                        f.write(screenshot_data)
+                    screenshot_data = await page.screenshot(**SCREENSHOT_OPTIONS)
+                    
+                    # Several captures can land in the same second; the content
+                    # hash keeps each filename unique and safe to cache forever
+                    timestamp = file_timestamp()
+                    digest = hashlib.sha256(screenshot_data).hexdigest()[:12]
+                    screenshot_filename = f"{task_id}_agent_action_{timestamp}_{digest}.{SCREENSHOT_EXT}"
+                    screenshot_path = agent_logger.screenshots_dir / screenshot_filename
+                    screenshot_writer.write(screenshot_path, screenshot_data)
                     
                     agent_logger.log_thought(f"✅ Screenshot captured via action: {description}")
                     
@@ -261,15 +799,31 @@ class BrowserExecutor:
                     agent_logger.log_thought(f"❌ Screenshot action error: {str(e)}")
                     return ActionResult(extracted_content=f"Screenshot failed: {str(e)}")
             
+            # Take a browser from the pool and open a fresh context for this task
+            browser = await browser_pool.acquire()
+            try:
+                browser_context = await browser.new_context(config=context_config)
+            except Exception:
+                agent_logger.close()
+                await browser_pool.release(browser, healthy=False)
+                raise
+            
             # Create browser-use agent with custom controller
-            agent = browser_use.Agent(
-                task=task,
-                llm=gemini_llm,
-                browser=browser,
-                use_vision=True,  # Enable vision for screenshots
-                save_conversation_path=str(self.logs_dir / "browser_conversation"),
-                controller=controller  # Use our custom controller
-            )
+            try:
+                agent = browser_use.Agent(
+                    task=task,
+                    llm=gemini_llm,
+                    browser=browser,
+                    browser_context=browser_context,
+                    use_vision=True,  # Enable vision for screenshots
+                    save_conversation_path=str(self.logs_dir / "browser_conversation") if enable_trace else None,
+                    controller=controller  # Use our custom controller
+                )
+            except Exception:
+                agent_logger.close()
+                await browser_context.close()
+                await browser_pool.release(browser)
+                raise
             
             # Store agent_logger reference for manual screenshot capture
             agent._custom_logger = agent_logger
@@ -279,229 +833,199 @@ class BrowserExecutor:
         except Exception as e:
             raise Exception(f"Error creating browser agent: {e}")
     
-    def save_execution_results(self, history, task_details: dict, task_id: str):
+    def save_screenshot_data(self, screenshot, screenshot_path: Path) -> bool:
+        """Write screenshot data in any of the formats browser-use hands back.
+        
+        Anything saved to a .webp path is re-encoded with Pillow.
+        """
+        webp = screenshot_path.suffix == ".webp"
+        if isinstance(screenshot, str) and (data_uri := DATA_URI_RE.match(screenshot)):
+            # Data URI
+            screenshot = base64.b64decode(screenshot[data_uri.end():])
+        
+        if isinstance(screenshot, bytes):
+            if webp:
+                Image.open(io.BytesIO(screenshot)).save(screenshot_path, "WEBP", quality=80, method=4)
+            else:
+                write_screenshot_file(screenshot_path, screenshot)
+        elif hasattr(screenshot, 'save'):
+            # PIL Image or similar
+            screenshot.save(str(screenshot_path))
+        elif isinstance(screenshot, str) and screenshot.startswith('/') and os.path.exists(screenshot):
+            # File path
+            if webp:
+                Image.open(screenshot).save(screenshot_path, "WEBP", quality=80, method=4)
+            else:
+                shutil.copy2(screenshot, screenshot_path)
+        else:
+            return False
+        return True
+    
+    def process_step(self, i: int, step, extractor, task_id: str, timestamp: str, default_timestamp: str) -> dict:
+        """Build the execution record for one history step and save its screenshot."""
+        extracted = extractor(step)
+        self.logger.debug("Step %d (%s): %s", i + 1, type(step).__name__, extracted["action"])
+        
+        step_record = {
+            "step_number": i + 1,
+            "action": extracted["action"] or "N/A",
+            "result": extracted["result"] or "N/A",
+            "timestamp": extracted["timestamp"] or default_timestamp,
+            "screenshot_url": None,
+            "raw_step_type": str(type(step))
+        }
+        
+        screenshot = extracted["screenshot"]
+        if screenshot:
+            screenshot_filename = f"{task_id}_step_{i+1}_{timestamp}.{STEP_SCREENSHOT_EXT}"
+            screenshot_path = self.screenshots_dir / screenshot_filename
+            try:
+                if self.save_screenshot_data(screenshot, screenshot_path):
+                    step_record["screenshot"] = str(screenshot_path)
+                    step_record["screenshot_url"] = f"/screenshots/{screenshot_filename}"
+                    self.logger.debug("Saved screenshot for step %d: %s", i + 1, screenshot_filename)
+            except Exception as e:
+                self.logger.error("Error saving screenshot for step %d: %s", i + 1, e)
+        
+        return step_record
+    
+    def write_log_record(self, log_fh, record_type: str, data: dict):
+        """Append one compact JSON line to an execution log."""
+        log_fh.write(orjson.dumps({"type": record_type, **data}, default=str) + b"\n")
+    
+    async def save_execution_results(self, history, task_details: dict, task_id: str):
         """Save browser execution results and screenshots with better handling."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # One clock read for the whole batch; steps without their own timestamp share it
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        now_iso = now.isoformat()
         
-        # Save execution log
-        log_file = self.logs_dir / f"browser_execution_{task_id}_{timestamp}.json"
+        # Execution log, written one JSON record per line as steps are processed
+        log_file = self.logs_dir / f"browser_execution_{task_id}_{timestamp}.jsonl"
+        log_fh = open(log_file, 'wb')
         
         results = {
             "task_id": task_id,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now_iso,
             "task_details": task_details,
             "execution_steps": [],
-            "screenshots": [],
             "screenshot_urls": [],  # URLs for frontend access
             "success": False,
-            "error": None,
-            "full_conversation": [],
-            "debug_info": {}
+            "error": None
         }
+        # Details kept only in the execution log, served by /task-results/{task_id}/full
+        step_records = []
+        screenshot_paths = []
+        debug_info = {}
+        self.write_log_record(log_fh, "task", {
+            "task_id": task_id,
+            "timestamp": results["timestamp"],
+            "task_details": task_details
+        })
         
         try:
-            # Debug the history object structure
-            print(f"🔍 Debug - History type: {type(history)}")
-            print(f"🔍 Debug - History dir: {dir(history)}")
-            
-            # Convert history to list if it's not already
-            if hasattr(history, '__iter__'):
+            # AgentHistoryList is a pydantic model, so iterating it directly
+            # yields (field, value) pairs rather than the recorded steps
+            if isinstance(history, AgentHistoryList):
+                history_list = history.history
+            elif hasattr(history, '__iter__'):
                 history_list = list(history)
             else:
                 history_list = [history] if history else []
             
-            print(f"🔍 Debug - History list length: {len(history_list)}")
+            self.logger.debug("History type: %s, length: %d", type(history), len(history_list))
             
             # Store debug info
-            results["debug_info"] = {
+            debug_info = {
                 "history_type": str(type(history)),
-                "history_length": len(history_list),
-                "history_attributes": dir(history) if history else []
+                "history_length": len(history_list)
             }
             
             if history_list:
-                for i, step in enumerate(history_list):
-                    print(f"🔍 Debug - Step {i+1} type: {type(step)}")
-                    print(f"🔍 Debug - Step {i+1} attributes: {dir(step)}")
-                    
-                    # Extract step information with better attribute checking
-                    step_info = {
-                        "step_number": i + 1,
-                        "action": "N/A",
-                        "result": "N/A", 
-                        "timestamp": datetime.now().isoformat(),
-                        "screenshot_url": None,
-                        "raw_step_type": str(type(step)),
-                        "step_attributes": dir(step)
-                    }
-                    
-                    # Handle tuple format (appears to be the actual format)
-                    if isinstance(step, tuple):
-                        print(f"🔍 Debug - Tuple length: {len(step)}")
-                        if len(step) >= 2:
-                            # Typically (model_output, result) or similar
-                            step_info["action"] = str(step[0]) if step[0] else "N/A"
-                            step_info["result"] = str(step[1]) if step[1] else "N/A"
-                            print(f"✅ Extracted from tuple - Action: {str(step[0])[:100]}...")
-                            print(f"✅ Extracted from tuple - Result: {str(step[1])[:100]}...")
-                            
-                        # Look for additional data in the tuple
-                        for j, item in enumerate(step):
-                            print(f"🔍 Debug - Tuple item {j}: {type(item)} = {str(item)[:100]}...")
-                            
-                            # Check if any item has screenshot data
-                            if hasattr(item, 'screenshot') and item.screenshot:
-                                screenshot_filename = f"{task_id}_step_{i+1}_{timestamp}.png"
-                                screenshot_path = self.screenshots_dir / screenshot_filename
-                                screenshot_url = f"/screenshots/{screenshot_filename}"
-                                
-                                try:
-                                    # Handle screenshot data
-                                    if isinstance(item.screenshot, bytes):
-                                        with open(screenshot_path, 'wb') as f:
-                                            f.write(item.screenshot)
-                                    elif hasattr(item.screenshot, 'save'):
-                                        item.screenshot.save(str(screenshot_path))
-                                    
-                                    step_info["screenshot"] = str(screenshot_path)
-                                    step_info["screenshot_url"] = screenshot_url
-                                    results["screenshots"].append(str(screenshot_path))
-                                    results["screenshot_urls"].append(screenshot_url)
-                                    
-                                    print(f"✅ Saved screenshot from tuple item {j}: {screenshot_filename}")
-                                    break
-                                except Exception as e:
-                                    print(f"❌ Error saving screenshot from tuple item {j}: {e}")
-                    
-                    else:
-                        # Try different attribute names for browser-use objects
-                        action_attrs = ['model_output', 'action', 'input', 'query', 'tool_calls']
-                        result_attrs = ['result', 'output', 'response', 'content']
-                        timestamp_attrs = ['timestamp', 'time', 'created_at']
-                        screenshot_attrs = ['screenshot', 'image', 'screen_capture', 'page_screenshot']
-                        
-                        # Extract action
-                        for attr in action_attrs:
-                            if hasattr(step, attr):
-                                value = getattr(step, attr)
-                                if value:
-                                    step_info["action"] = str(value)
-                                    print(f"✅ Found action in {attr}: {str(value)[:100]}...")
-                                    break
-                        
-                        # Extract result
-                        for attr in result_attrs:
-                            if hasattr(step, attr):
-                                value = getattr(step, attr)
-                                if value:
-                                    step_info["result"] = str(value)
-                                    print(f"✅ Found result in {attr}: {str(value)[:100]}...")
-                                    break
-                        
-                        # Extract timestamp
-                        for attr in timestamp_attrs:
-                            if hasattr(step, attr):
-                                value = getattr(step, attr)
-                                if value:
-                                    if hasattr(value, 'isoformat'):
-                                        step_info["timestamp"] = value.isoformat()
-                                    else:
-                                        step_info["timestamp"] = str(value)
-                                    print(f"✅ Found timestamp in {attr}: {step_info['timestamp']}")
-                                    break
-                        
-                        # Look for screenshots in various possible locations
-                        screenshot_found = False
-                        for attr in screenshot_attrs:
-                            if hasattr(step, attr):
-                                screenshot = getattr(step, attr)
-                                if screenshot:
-                                    screenshot_filename = f"{task_id}_step_{i+1}_{timestamp}.png"
-                                    screenshot_path = self.screenshots_dir / screenshot_filename
-                                    screenshot_url = f"/screenshots/{screenshot_filename}"
-                                    
-                                    try:
-                                        # Handle different screenshot formats
-                                        if isinstance(screenshot, bytes):
-                                            with open(screenshot_path, 'wb') as f:
-                                                f.write(screenshot)
-                                        elif hasattr(screenshot, 'save'):
-                                            # PIL Image or similar
-                                            screenshot.save(str(screenshot_path))
-                                        elif isinstance(screenshot, str) and screenshot.startswith(('http', '/', 'data:')):
-                                            # URL or data URI - try to download/decode
-                                            if screenshot.startswith('data:image'):
-                                                import base64
-                                                header, data = screenshot.split(',', 1)
-                                                with open(screenshot_path, 'wb') as f:
-                                                    f.write(base64.b64decode(data))
-                                            elif screenshot.startswith('/') and os.path.exists(screenshot):
-                                                # File path
-                                                import shutil
-                                                shutil.copy2(screenshot, screenshot_path)
-                                        
-                                        step_info["screenshot"] = str(screenshot_path)
-                                        step_info["screenshot_url"] = screenshot_url
-                                        results["screenshots"].append(str(screenshot_path))
-                                        results["screenshot_urls"].append(screenshot_url)
-                                        screenshot_found = True
-                                        
-                                        print(f"✅ Saved screenshot from {attr}: {screenshot_filename}")
-                                        break
-                                        
-                                    except Exception as e:
-                                        print(f"❌ Error saving screenshot from {attr}: {e}")
-                    
-                    # Add conversation details if available
-                    if step_info["action"] != "N/A":
-                        results["full_conversation"].append({
-                            "step": i + 1,
-                            "model_output": step_info["action"],
-                            "timestamp": step_info["timestamp"]
-                        })
-                    
-                    results["execution_steps"].append(step_info)
+                # Steps all share one type, so pick the extractor once
+                extractor = STEP_EXTRACTORS.get(type(history_list[0]), extract_generic_step)
+                
+                # Steps are independent: extract, decode and write them off the
+                # event loop, at most STEP_WORKERS at a time, keeping step order
+                step_limit = asyncio.Semaphore(STEP_WORKERS)
+                
+                # Full records go to the log as soon as every earlier step is
+                # done, so a crash mid-batch still leaves the finished prefix on disk
+                finished_records: Dict[int, dict] = {}
+                next_step = 0
+                log_lock = threading.Lock()
+                
+                def process_and_log(i, step):
+                    nonlocal next_step
+                    step_record = self.process_step(i, step, extractor, task_id, timestamp, now_iso)
+                    with log_lock:
+                        finished_records[i] = step_record
+                        while next_step in finished_records:
+                            self.write_log_record(log_fh, "step", finished_records.pop(next_step))
+                            next_step += 1
+                    return step_record
+                
+                async def process_step_limited(i, step):
+                    async with step_limit:
+                        return await asyncio.to_thread(process_and_log, i, step)
+                
+                step_records = await asyncio.gather(*(process_step_limited(i, step) for i, step in enumerate(history_list)))
+                
+                # The response only carries what the frontend renders
+                for step_record in step_records:
+                    if "screenshot" in step_record:
+                        screenshot_paths.append(step_record["screenshot"])
+                        results["screenshot_urls"].append(step_record["screenshot_url"])
+                    results["execution_steps"].append({field: step_record[field] for field in LEAN_STEP_FIELDS})
                 
                 results["success"] = True
-                print(f"✅ Processed {len(history_list)} execution steps with {len(results['screenshots'])} screenshots")
+                self.logger.info("Processed %d execution steps with %d screenshots", len(history_list), len(results["screenshot_urls"]))
             else:
-                print("⚠️ No history items found")
+                self.logger.warning("No history items found")
             
         except Exception as e:
             results["error"] = str(e)
-            print(f"❌ Error processing browser history: {e}")
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
+            self.logger.exception("Error processing browser history: %s", e)
         
-        # Save results to file
+        # Finish the execution log with a summary record
         try:
-            with open(log_file, 'w') as f:
-                json.dump(results, f, indent=2, default=str)
+            self.write_log_record(log_fh, "summary", {
+                "task_id": task_id,
+                "success": results["success"],
+                "error": results["error"],
+                "steps": len(results["execution_steps"]),
+                "screenshots": screenshot_paths,
+                "screenshot_urls": results["screenshot_urls"],
+                "debug_info": debug_info
+            })
             results["log_file"] = str(log_file)
-            print(f"✅ Execution results saved to: {log_file}")
+            self.logger.info("Execution results saved to: %s", log_file)
         except Exception as e:
             results["error"] = f"Error saving results: {e}"
-            print(f"❌ Error saving results file: {e}")
+            self.logger.error("Error saving results file: %s", e)
+        finally:
+            log_fh.close()
         
         return results
     
-    async def execute_task(self, target_url: str, task_description: str, screenshot_instructions: list, task_id: str):
+    async def execute_task(self, instructions: TestInstructions, task_id: str):
         """Execute browser automation task directly."""
-        task_details = {
-            "target_url": target_url,
-            "task_description": task_description,
-            "screenshot_instructions": screenshot_instructions
-        }
+        target_url = instructions.target_url
+        task_description = instructions.task_description
+        screenshot_instructions = instructions.screenshot_instructions
+        enable_trace = instructions.enable_trace
+        enable_recording = instructions.enable_recording
+        task_details = instructions.model_dump(include={"target_url", "task_description", "screenshot_instructions"})
         
         # Update task status
-        task_storage[task_id]["status"] = "running"
-        task_storage[task_id]["progress"] = "Setting up logging..."
+        await task_storage.update(task_id, status="running", progress="Setting up logging...")
         
         # Setup comprehensive logging
         logger, detailed_log_path = self.setup_detailed_logging(task_id)
+        self.logger = logger
         
         # Setup stdout/stderr capture
-        original_stdout, original_stderr, stdout_capture, stderr_capture, stdout_log_path, stderr_log_path = self.capture_stdout_stderr(task_id)
+        stdout_output, stderr_output, output_tokens, stdout_log_path, stderr_log_path = self.capture_stdout_stderr(task_id)
         
         logger.info(f"=== STARTING AGENT EXECUTION FOR TASK {task_id} ===")
         logger.info(f"Target URL: {target_url}")
@@ -526,7 +1050,7 @@ class BrowserExecutor:
         if screenshot_instructions:
             full_task += "\nAdditional Screenshot Requirements:"
             for i, instr in enumerate(screenshot_instructions):
-                full_task += f"\n{i+1}. {instr.get('step_description', 'N/A')} (save as {instr.get('filename', f'screenshot_{i+1}.png')})"
+                full_task += f"\n{i+1}. {instr.step_description} (save as {instr.filename})"
         
         full_task += "\n\nRemember to use the custom logging functions throughout your execution!"
         
@@ -534,58 +1058,75 @@ class BrowserExecutor:
         
         try:
             # Create browser agent
-            task_storage[task_id]["progress"] = "Initializing browser agent..."
+            await task_storage.update(task_id, progress="Initializing browser agent...")
             logger.info("Creating browser agent...")
-            browser_agent = await self.create_browser_agent(full_task, task_id)
+            browser_agent = await self.create_browser_agent(full_task, task_id, enable_trace, enable_recording)
             logger.info("Browser agent created successfully")
             
             # Execute the task
-            task_storage[task_id]["progress"] = "Executing automation task..."
+            await task_storage.update(task_id, progress="Executing automation task...")
             logger.info("Starting agent.run() execution...")
             
             # Capture initial screenshot
             logger.info("Capturing initial screenshot...")
-            initial_screenshot_path, initial_screenshot_url = await self.capture_manual_screenshot(browser_agent, task_id, "initial")
+            initial_screenshot_path, initial_screenshot_url, initial_written = await self.capture_manual_screenshot(browser_agent, task_id, "initial")
+            
+            # Replay a cached plan for this task and page
+            page = await self.get_page_fingerprint(browser_agent, target_url)
+            screenshots = [(instr.step_description, instr.filename) for instr in screenshot_instructions]
+            plan_key = fingerprint(task_description, target_url, page, screenshots) if page else None
+            history = None
+            replay_results = None
+            if plan_key:
+                cached_plan = await asyncio.to_thread(plan_cache.get, plan_key)
+                if cached_plan:
+                    await task_storage.update(task_id, progress="Replaying cached plan...")
+                    replayed = await self.replay_cached_plan(browser_agent, cached_plan)
+                    if replayed:
+                        history, replay_results = replayed
+            plan_cache_hit = history is not None
             
-            # The agent execution will output to our captured stdout/stderr
-            history = await browser_agent.run()
+            if not plan_cache_hit:
+                # The agent execution will output to our captured stdout/stderr
+                history = await browser_agent.run()
+                
+                # is_done() is also true for done(success=False); only cache plans that passed
+                if plan_key and history.is_successful():
+                    try:
+                        # Writes the plan, then globs and stats the cache for eviction
+                        await asyncio.to_thread(plan_cache.put, plan_key, history)
+                        logger.info(f"Saved plan to cache: {plan_key}")
+                    except Exception as e:
+                        logger.error(f"Error saving plan to cache: {e}")
             
             # Capture final screenshot
             logger.info("Capturing final screenshot...")
-            final_screenshot_path, final_screenshot_url = await self.capture_manual_screenshot(browser_agent, task_id, "final")
+            final_screenshot_path, final_screenshot_url, final_written = await self.capture_manual_screenshot(browser_agent, task_id, "final")
             
             logger.info("Agent execution completed")
             logger.info(f"History type: {type(history)}")
             logger.info(f"History length: {len(list(history)) if history else 0}")
             
             # Save results and screenshots
-            task_storage[task_id]["progress"] = "Saving results and screenshots..."
+            await task_storage.update(task_id, progress="Saving results and screenshots...")
             logger.info("Processing execution results...")
-            results = self.save_execution_results(history, task_details, task_id)
+            results = await self.save_execution_results(history, task_details, task_id)
+            results["plan_cache_hit"] = plan_cache_hit
+            if plan_cache_hit:
+                # Replayed steps carry no results of their own; this is what the replay did
+                results["replay_results"] = [result.model_dump(exclude_none=True) for result in replay_results]
             
-            # Add manual screenshots to results
-            if initial_screenshot_path:
-                results["screenshots"].append(initial_screenshot_path)
+            # Add manual screenshots to results, once their files are actually on disk
+            if initial_screenshot_path and await initial_written:
                 results["screenshot_urls"].append(initial_screenshot_url)
                 logger.info(f"Added initial screenshot: {initial_screenshot_path}")
                 
-            if final_screenshot_path:
-                results["screenshots"].append(final_screenshot_path)
+            if final_screenshot_path and await final_written:
                 results["screenshot_urls"].append(final_screenshot_url)
                 logger.info(f"Added final screenshot: {final_screenshot_path}")
             
             logger.info("Results processed successfully")
             
-            # Close browser
-            logger.info("Closing browser...")
-            await browser_agent.browser.close()
-            logger.info("Browser closed")
-            
-            # Update task status
-            task_storage[task_id]["status"] = "completed"
-            task_storage[task_id]["end_time"] = datetime.now().isoformat()
-            task_storage[task_id]["results"] = results
-            
             # Add log file paths to results
             results["detailed_log_file"] = str(detailed_log_path)
             results["stdout_log_file"] = str(stdout_log_path)
@@ -595,6 +1136,17 @@ class BrowserExecutor:
             if hasattr(browser_agent, '_custom_logger'):
                 results["agent_thoughts_file"] = str(browser_agent._custom_logger.log_file)
             
+            # Make sure queued screenshots are on disk before results are served
+            await screenshot_writer.join()
+            
+            # Update task status
+            await task_storage.update(
+                task_id,
+                status="completed",
+                end_time=datetime.now().isoformat(),
+                results=results
+            )
+            
             logger.info(f"=== TASK {task_id} COMPLETED SUCCESSFULLY ===")
             
             return results
@@ -602,7 +1154,6 @@ class BrowserExecutor:
         except Exception as e:
             logger.error(f"ERROR during task execution: {str(e)}")
             logger.error(f"Exception type: {type(e)}")
-            import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             
             error_result = {
@@ -612,7 +1163,6 @@ class BrowserExecutor:
                 "success": False,
                 "error": str(e),
                 "execution_steps": [],
-                "screenshots": [],
                 "screenshot_urls": [],
                 "detailed_log_file": str(detailed_log_path),
                 "stdout_log_file": str(stdout_log_path),
@@ -624,88 +1174,227 @@ class BrowserExecutor:
                 error_result["agent_thoughts_file"] = str(browser_agent._custom_logger.log_file)
             
             # Update task status
-            task_storage[task_id]["status"] = "failed"
-            task_storage[task_id]["end_time"] = datetime.now().isoformat()
-            task_storage[task_id]["error"] = str(e)
-            task_storage[task_id]["results"] = error_result
+            await task_storage.update(
+                task_id,
+                status="failed",
+                end_time=datetime.now().isoformat(),
+                error=str(e),
+                results=error_result
+            )
             
             logger.info(f"=== TASK {task_id} FAILED ===")
             
             return error_result
             
         finally:
-            # Restore original stdout/stderr
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
+            # Close this task's context and hand the browser back to the pool
+            if 'browser_agent' in locals():
+                logger.info("Closing browser context...")
+                try:
+                    await browser_agent.browser_context.close()
+                    await browser_pool.release(browser_agent.browser)
+                    logger.info("Browser context closed")
+                except Exception as e:
+                    logger.error(f"Error closing browser context: {e}")
+                    await browser_pool.release(browser_agent.browser, healthy=False)
+            
+            # Write out any agent thoughts still buffered
+            if 'browser_agent' in locals():
+                browser_agent._custom_logger.close()
+            
+            # Stop copying this context's output, then flush and close the log files
+            task_stdout.reset(output_tokens[0])
+            task_stderr.reset(output_tokens[1])
+            stdout_output.close()
+            stderr_output.close()
             
-            # Log final captured output
-            logger.info("=== CAPTURED STDOUT ===")
-            logger.info(stdout_capture.getvalue())
-            logger.info("=== CAPTURED STDERR ===")
-            logger.info(stderr_capture.getvalue())
-            logger.info("=== END OF EXECUTION LOG ===")
+            # Append the captured output straight to the log file, bypassing
+            # the formatter; it's raw output, not log records
+            for handler in logger.handlers:
+                stream = handler.stream
+                stream.write("=== CAPTURED STDOUT ===\n")
+                stdout_output.capture.dump_to(stream)
+                stream.write("=== CAPTURED STDERR ===\n")
+                stderr_output.capture.dump_to(stream)
+                stream.write("=== END OF EXECUTION LOG ===\n")
+                stream.flush()
             
             # Close logger handlers
             for handler in logger.handlers[:]:
                 handler.close()
                 logger.removeHandler(handler)
 
+    async def get_page_fingerprint(self, browser_agent, target_url: str):
+        """Load the target page and fingerprint it for the plan cache.
+        
+        Costs a navigation and an HTML dump before every run, hit or miss.
+        """
+        try:
+            await browser_agent.browser_context.navigate_to(target_url)
+            dom = await browser_agent.browser_context.get_page_html()
+            return page_fingerprint(dom)
+        except Exception as e:
+            self.logger.error("Could not fingerprint page for plan cache: %s", e)
+            return None
+    
+    async def reset_browser_context(self, browser_agent):
+        """Give the agent a fresh context, so a half-finished replay's cookies and cart don't carry over."""
+        old_context = browser_agent.browser_context
+        browser_agent.browser_context = await browser_agent.browser.new_context(config=old_context.config)
+        try:
+            await old_context.close()
+        except Exception as e:
+            self.logger.error("Error closing replayed browser context: %s", e)
+    
+    async def replay_cached_plan(self, browser_agent, plan_path: Path):
+        """Replay a cached agent history.
+        
+        Returns the replayed steps and this run's action results, or None if
+        the replay fails.
+        """
+        try:
+            history = AgentHistoryList.load_from_file(plan_path, browser_agent.AgentOutput)
+            self.logger.info("Replaying cached plan: %s", plan_path)
+            replay_results = await browser_agent.rerun_history(history, skip_failures=False)
+            # Some actions report failure in their result instead of raising
+            errors = [result.error for result in replay_results if result.error]
+            if errors:
+                raise RuntimeError(f"replayed actions failed: {errors}")
+            self.logger.info("Cached plan replayed successfully")
+        except Exception as e:
+            self.logger.error("Cached plan replay failed, falling back to agent run: %s", e)
+            await self.reset_browser_context(browser_agent)
+            return None
+        
+        # Only the actions come from the cache; drop the original run's results, screenshots and timings
+        for step in history.history:
+            step.result = []
+            step.state.screenshot = None
+            step.metadata = None
+        return history, replay_results
+    
+    async def find_page(self, browser_agent):
+        """Find the agent's current page, returning (accessor name, page) or (None, None).
+        
+        The accessor that worked last time is tried on its own first; otherwise
+        all accessors race so one that hangs doesn't hold up the others.
+        """
+        if self._page_accessor is not None:
+            name, get_page = self._page_accessor
+            try:
+                page = await asyncio.wait_for(get_page(browser_agent), PAGE_PROBE_TIMEOUT)
+                if page:
+                    return name, page
+            except Exception as e:
+                self.logger.debug("Page accessor %s failed: %s", name, e)
+        
+        probes = {asyncio.create_task(get_page(browser_agent)): (name, get_page) for name, get_page in PAGE_ACCESSORS}
+        pending = set(probes)
+        deadline = asyncio.get_running_loop().time() + PAGE_PROBE_TIMEOUT
+        try:
+            while pending:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                # Among probes finishing together, prefer the earlier accessor
+                for probe in sorted(done, key=lambda t: PAGE_ACCESSORS.index(probes[t])):
+                    accessor = probes[probe]
+                    if probe.exception() is not None:
+                        self.logger.debug("Page accessor %s failed: %s", accessor[0], probe.exception())
+                    elif probe.result():
+                        self._page_accessor = accessor
+                        return accessor[0], probe.result()
+        finally:
+            for probe in pending:
+                probe.cancel()
+        return None, None
+    
     async def capture_manual_screenshot(self, browser_agent, task_id: str, step_name: str):
-        """Manually capture a screenshot from the browser agent."""
+        """Manually capture a screenshot from the browser agent.
+        
+        Returns (path, url, written), where written resolves once the queued
+        file write has succeeded or failed.
+        """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_filename = f"{task_id}_{step_name}_{timestamp}.png"
+            timestamp = file_timestamp()
+            screenshot_filename = f"{task_id}_{step_name}_{timestamp}.{SCREENSHOT_EXT}"
             screenshot_path = self.screenshots_dir / screenshot_filename
             screenshot_url = f"/screenshots/{screenshot_filename}"
             
-            # Try to get screenshot from browser using Browser Use's actual API
-            if hasattr(browser_agent, 'browser') and browser_agent.browser:
-                # Method 1: Try browser_agent.browser.get_current_page()
-                try:
-                    current_page = await browser_agent.browser.get_current_page()
-                    if current_page:
-                        screenshot_data = await current_page.screenshot()
-                        with open(screenshot_path, 'wb') as f:
-                            f.write(screenshot_data)
-                        print(f"✅ Manual screenshot captured via get_current_page: {screenshot_filename}")
-                        return str(screenshot_path), screenshot_url
-                except Exception as e:
-                    print(f"❌ Method 1 failed: {e}")
-                
-                # Method 2: Try accessing browser_context directly
-                try:
-                    if hasattr(browser_agent.browser, 'browser_context'):
-                        pages = browser_agent.browser.browser_context.pages
-                        if pages:
-                            page = pages[0]  # Get first page
-                            screenshot_data = await page.screenshot()
-                            with open(screenshot_path, 'wb') as f:
-                                f.write(screenshot_data)
-                            print(f"✅ Manual screenshot captured via browser_context: {screenshot_filename}")
-                            return str(screenshot_path), screenshot_url
-                except Exception as e:
-                    print(f"❌ Method 2 failed: {e}")
-                
-                # Method 3: Try browser._browser_context
-                try:
-                    if hasattr(browser_agent.browser, '_browser_context'):
-                        pages = browser_agent.browser._browser_context.pages
-                        if pages:
-                            page = pages[0]  # Get first page
-                            screenshot_data = await page.screenshot()
-                            with open(screenshot_path, 'wb') as f:
-                                f.write(screenshot_data)
-                            print(f"✅ Manual screenshot captured via _browser_context: {screenshot_filename}")
-                            return str(screenshot_path), screenshot_url
-                except Exception as e:
-                    print(f"❌ Method 3 failed: {e}")
+            name, page = await self.find_page(browser_agent)
+            if page is None:
+                self.logger.warning("Could not capture manual screenshot: no accessible browser page found")
+                return None, None, None
             
-            print(f"❌ Could not capture manual screenshot: no accessible browser page found")
-            return None, None
+            screenshot_data = await page.screenshot(**SCREENSHOT_OPTIONS)
+            written = screenshot_writer.write(screenshot_path, screenshot_data)
+            self.logger.info("Manual screenshot captured via %s: %s", name, screenshot_filename)
+            return str(screenshot_path), screenshot_url, written
             
         except Exception as e:
-            print(f"❌ Error capturing manual screenshot: {e}")
-            return None, None
+            self.logger.error("Error capturing manual screenshot: %s", e)
+            return None, None, None
+
+# Analyses are deterministic in their inputs, so both the tool's report and
+# the LLM's write-up are kept on disk keyed by a hash of those inputs
+analysis_cache_dir = logs_dir / "analysis_cache"
+analysis_cache_dir.mkdir(parents=True, exist_ok=True)
+
+def analysis_key(execution_results: dict, original_instructions: dict) -> str:
+    """Stable hash of the inputs to an analysis."""
+    payload = orjson.dumps([execution_results, original_instructions], option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(payload).hexdigest()
+
+def load_cached_analysis(name: str) -> Optional[dict]:
+    """Return a cached analysis, or None if there isn't one."""
+    try:
+        with open(analysis_cache_dir / f"{name}.json", 'rb') as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+def store_cached_analysis(name: str, analysis: dict):
+    """Atomically write an analysis to the cache."""
+    path = analysis_cache_dir / f"{name}.json"
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(analysis, default=str))
+    os.replace(tmp_path, path)
+
+# Step actions that count as visiting the target page
+NAV_RE = re.compile(r"navigate", re.IGNORECASE)
+
+def count_actions(steps: list) -> int:
+    """Number of steps where the agent took an action."""
+    return sum(1 for step in steps if step.get("action", "N/A") != "N/A")
+
+def target_url_accessed(steps: list, target_url: str) -> bool:
+    """Whether any step navigated or mentions the target URL."""
+    url_re = re.compile(f"{NAV_RE.pattern}|{re.escape(target_url)}", re.IGNORECASE) if target_url else NAV_RE
+    return any(url_re.search(step.get("action") or "") for step in steps)
+
+def summarize_results(execution_results: dict, original_instructions: dict) -> dict:
+    """Cut execution results down to what the analyzer needs for its prompt.
+    
+    Keeps the outcome, the first few steps (where navigation happens) and
+    the last few (where the task finishes), instead of every step and
+    screenshot URL. Totals and step-derived checks are computed over the
+    full results first, so the report doesn't depend on the trimmed steps.
+    """
+    steps = execution_results.get("execution_steps", [])
+    screenshot_urls = execution_results.get("screenshot_urls", [])
+    return {
+        "task_id": execution_results.get("task_id"),
+        "success": execution_results.get("success"),
+        "error": execution_results.get("error"),
+        "steps_total": len(steps),
+        "conversation_length": count_actions(steps),
+        "target_url_accessed": target_url_accessed(steps, original_instructions.get("target_url", "")),
+        "execution_steps": steps if len(steps) <= 8 else steps[:3] + steps[-5:],
+        "screenshots_total": len(screenshot_urls),
+        "screenshot_urls": screenshot_urls[:20],
+    }
 
 class ResultsAnalyzer:
     """Tool to analyze browser automation results."""
@@ -726,6 +1415,11 @@ class ResultsAnalyzer:
         Returns:
             Analysis and review report
         """
+        cache_key = analysis_key(execution_results, original_instructions)
+        cached_report = load_cached_analysis(f"report_{cache_key}")
+        if cached_report is not None:
+            return cached_report
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         task_id = execution_results.get("task_id", "unknown")
         
@@ -735,13 +1429,13 @@ class ResultsAnalyzer:
             "original_instructions": original_instructions,
             "execution_summary": {
                 "success": execution_results.get("success", False),
-                "steps_completed": len(execution_results.get("execution_steps", [])),
-                "screenshots_captured": len(execution_results.get("screenshots", [])),
+                "steps_completed": execution_results.get("steps_total", len(execution_results.get("execution_steps", []))),
+                "screenshots_captured": execution_results.get("screenshots_total", len(execution_results.get("screenshot_urls", []))),
                 "error": execution_results.get("error")
             },
             "detailed_analysis": {
-                "conversation_length": len(execution_results.get("full_conversation", [])),
-                "screenshot_analysis": "Screenshots captured at key moments" if execution_results.get("screenshots") else "No screenshots captured"
+                "conversation_length": execution_results.get("conversation_length", count_actions(execution_results.get("execution_steps", []))),
+                "screenshot_analysis": "Screenshots captured at key moments" if execution_results.get("screenshot_urls") else "No screenshots captured"
             },
             "recommendations": [],
             "compliance_check": {}
@@ -751,21 +1445,24 @@ class ResultsAnalyzer:
         task_desc = original_instructions.get("task_description", "")
         execution_steps = execution_results.get("execution_steps", [])
         
-        # Check if target URL was accessed
+        # Check if target URL was accessed; prompt summaries carry the answer for all steps
         target_url = original_instructions.get("target_url", "")
-        url_accessed = any("navigate" in step.get("action", "").lower() or 
-                          target_url in step.get("action", "") for step in execution_steps)
+        url_accessed = execution_results.get("target_url_accessed")
+        if url_accessed is None:
+            url_accessed = target_url_accessed(execution_steps, target_url)
         
         review_report["compliance_check"]["target_url_accessed"] = url_accessed
         
         # Check screenshot requirements
         required_screenshots = original_instructions.get("screenshot_instructions", [])
-        captured_screenshots = execution_results.get("screenshots", [])
+        captured_screenshots = execution_results.get("screenshot_urls", [])
+        # Prompt summaries list only some screenshots but carry the full count
+        captured_count = execution_results.get("screenshots_total", len(captured_screenshots))
         
         review_report["compliance_check"]["screenshots_captured"] = {
             "required": len(required_screenshots),
-            "captured": len(captured_screenshots),
-            "meets_requirements": len(captured_screenshots) >= len(required_screenshots) if required_screenshots else True
+            "captured": captured_count,
+            "meets_requirements": captured_count >= len(required_screenshots) if required_screenshots else True
         }
         
         # Generate recommendations
@@ -775,53 +1472,125 @@ class ResultsAnalyzer:
         if not url_accessed:
             review_report["recommendations"].append(f"Target URL {target_url} may not have been properly accessed")
         
-        if required_screenshots and len(captured_screenshots) < len(required_screenshots):
+        if required_screenshots and captured_count < len(required_screenshots):
             review_report["recommendations"].append("Not all required screenshots were captured")
         
         if execution_results.get("success", False) and url_accessed:
             review_report["recommendations"].append("Task appears to have completed successfully")
-            if captured_screenshots:
-                review_report["recommendations"].append(f"Successfully captured {len(captured_screenshots)} screenshots")
+            if captured_count:
+                review_report["recommendations"].append(f"Successfully captured {captured_count} screenshots")
         
         # Save review report
         review_file = self.logs_dir / f"review_report_{task_id}_{timestamp}.json"
         try:
-            with open(review_file, 'w') as f:
-                json.dump(review_report, f, indent=2, default=str)
+            with open(review_file, 'wb') as f:
+                f.write(orjson.dumps(review_report, default=str))
             review_report["review_file"] = str(review_file)
+            store_cached_analysis(f"report_{cache_key}", review_report)
         except Exception as e:
             review_report["error"] = f"Error saving review report: {e}"
         
         return review_report
 
+def get_analyzer_model():
+    """Gemini model for the analysis agent, built on first use and shared.
+    
+    Agent and Gemini are imported lazily so the server starts, and answers
+    /health, without loading them.
+    """
+    if getattr(app.state, "analyzer_model", None) is None:
+        from agno.models.google import Gemini
+        
+        app.state.analyzer_model = Gemini(id="gemini-2.0-flash", api_key=GEMINI_API_KEY)
+    return app.state.analyzer_model
+
+def build_analyzer_agent():
+    """Fresh agno analysis agent around the shared model.
+    
+    An agent's memory grows with every run, so each analysis gets its own.
+    """
+    from agno.agent import Agent
+    
+    return Agent(
+        model=get_analyzer_model(),
+        tools=[ResultsAnalyzer()],
+        instructions=[
+            "You are a website testing analysis expert.",
+            "Your role is to analyze browser automation results and provide comprehensive reports.",
+            "Use the AnalyzeResults tool to examine execution outcomes.",
+            "Provide detailed findings, compliance checks, and recommendations.",
+            "Generate clear, actionable insights from the test execution data."
+        ],
+        markdown=True,
+        show_tool_calls=True,
+    )
+
 # Custom tool for agent logging
+# Open AgentLoggers, so shutdown can flush whatever they still buffer
+_agent_loggers = weakref.WeakSet()
+
 class AgentLogger:
     """Custom tool for the browser agent to log information and take screenshots."""
     
+    # Write buffered thoughts once this much is pending, or this long after the
+    # last write; /agent-thoughts also flushes before reading the file
+    FLUSH_BYTES = 128 * 1024
+    FLUSH_INTERVAL = 1.0
+    BUFFER_BYTES = 8 * 1024
+    
     def __init__(self, logs_dir: Path, task_id: str):
         self.logs_dir = logs_dir
         self.task_id = task_id
         self.log_file = logs_dir / f"agent_thoughts_{task_id}.txt"
         self.screenshots_dir = logs_dir / "screenshots"
         self.screenshot_count = 0
+        self._fh = open(self.log_file, 'ab', buffering=0)
+        self._buf = bytearray()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        _agent_loggers.add(self)
         
     def log_thought(self, message: str) -> str:
         """Log agent thoughts and actions to file."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = log_timestamp()
         log_entry = f"[{timestamp}] {message}\n"
         
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
-            f.flush()
+        with self._lock:
+            self._buf += log_entry.encode('utf-8')
+            if (len(self._buf) >= self.FLUSH_BYTES
+                    or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL):
+                self._flush_locked()
         
         print(f"🤖 Agent Log: {message}")
         return f"Logged: {message}"
     
+    def _flush_locked(self):
+        if self._buf and not self._fh.closed:
+            self._fh.write(self._buf)
+        # Don't hold on to a large buffer after a burst of logging
+        if len(self._buf) > self.BUFFER_BYTES:
+            self._buf = bytearray()
+        else:
+            self._buf.clear()
+        self._last_flush = time.monotonic()
+    
+    def flush(self):
+        """Write any buffered thoughts to the log file."""
+        with self._lock:
+            self._flush_locked()
+    
+    def close(self):
+        """Flush and close the log file."""
+        with self._lock:
+            self._flush_locked()
+            self._fh.close()
+        _agent_loggers.discard(self)
+    
     def save_screenshot(self, description: str = "screenshot") -> str:
         """Save a screenshot with description."""
         self.screenshot_count += 1
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{self.task_id}_manual_{self.screenshot_count}_{timestamp}.png"
+        timestamp = file_timestamp()
+        filename = f"{self.task_id}_manual_{self.screenshot_count}_{timestamp}.{SCREENSHOT_EXT}"
         filepath = self.screenshots_dir / filename
         
         self.log_thought(f"Taking screenshot: {description}")
@@ -832,35 +1601,79 @@ class AgentLogger:
     def get_screenshot_path(self, description: str = "screenshot"):
         """Get the path where a screenshot should be saved."""
         self.screenshot_count += 1
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{self.task_id}_agent_{self.screenshot_count}_{timestamp}.png"
+        timestamp = file_timestamp()
+        filename = f"{self.task_id}_agent_{self.screenshot_count}_{timestamp}.{SCREENSHOT_EXT}"
         return self.screenshots_dir / filename, f"/screenshots/{filename}"
 
+async def task_worker():
+    """Pull queued tasks and run them one at a time."""
+    while True:
+        task_id, instructions = await task_queue.get()
+        try:
+            executor = BrowserExecutor()
+            await executor.execute_task(instructions, task_id)
+        except Exception as e:
+            await task_storage.update(
+                task_id,
+                status="failed",
+                end_time=datetime.now().isoformat(),
+                error=str(e)
+            )
+        finally:
+            task_queue.task_done()
+
+@app.on_event("startup")
+async def start_task_workers():
+    """Start the browser task worker pool."""
+    install_output_tees()
+    for _ in range(MAX_CONCURRENT_TASKS):
+        asyncio.create_task(task_worker())
+    if GEMINI_API_KEY:
+        get_gemini_llm()
+    screenshot_writer.start()
+    await browser_pool.start()
+
+@app.on_event("shutdown")
+async def close_browser_pool():
+    """Flush agent thought logs and screenshots and close pooled browsers on shutdown."""
+    for agent_logger in list(_agent_loggers):
+        agent_logger.close()
+    await screenshot_writer.close()
+    await browser_pool.close()
+
 # API Endpoints
 
+# Static responses, encoded once instead of rebuilt and serialized per request
+ROOT_RESPONSE = orjson.dumps({
+    "message": "Website Testing Agent API",
+    "version": "1.0.0",
+    "endpoints": {
+        "POST /execute-test": "Execute browser automation test",
+        "GET /task-status/{task_id}": "Get task execution status",
+        "GET /task-results/{task_id}": "Get task execution results",
+        "GET /task-results/{task_id}/full": "Get the full execution log",
+        "POST /analyze-results/{task_id}": "Analyze task results",
+        "GET /screenshots/{filename}": "Serve screenshot files",
+        "GET /health": "Health check"
+    }
+})
+HEALTH_RESPONSE_PREFIX = b'{"status":"healthy","timestamp":"'
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
-    return {
-        "message": "Website Testing Agent API",
-        "version": "1.0.0",
-        "endpoints": {
-            "POST /execute-test": "Execute browser automation test",
-            "GET /task-status/{task_id}": "Get task execution status",
-            "GET /task-results/{task_id}": "Get task execution results",
-            "POST /analyze-results/{task_id}": "Analyze task results",
-            "GET /screenshots/{filename}": "Serve screenshot files",
-            "GET /health": "Health check"
-        }
-    }
+    return Response(ROOT_RESPONSE, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return Response(
+        HEALTH_RESPONSE_PREFIX + datetime.now().isoformat().encode() + b'"}',
+        media_type="application/json"
+    )
 
 @app.post("/execute-test", response_model=Dict)
-async def execute_test(instructions: TestInstructions, background_tasks: BackgroundTasks):
+async def execute_test(instructions: TestInstructions):
     """Execute browser automation test."""
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
@@ -869,23 +1682,17 @@ async def execute_test(instructions: TestInstructions, background_tasks: Backgro
     task_id = f"task_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
     
     # Initialize task status
-    task_storage[task_id] = {
+    await task_storage.create(task_id, {
         "task_id": task_id,
         "status": "pending",
         "start_time": datetime.now().isoformat(),
         "progress": "Task queued for execution",
-        "instructions": instructions.model_dump()
-    }
+        # Kept as the model; only dumped where a dict is actually needed
+        "instructions": instructions
+    })
     
-    # Execute task in background
-    executor = BrowserExecutor()
-    background_tasks.add_task(
-        executor.execute_task,
-        instructions.target_url,
-        instructions.task_description,
-        [instr.model_dump() for instr in instructions.screenshot_instructions],
-        task_id
-    )
+    # Queue task for the worker pool
+    await task_queue.put((task_id, instructions))
     
     return {
         "task_id": task_id,
@@ -897,10 +1704,9 @@ async def execute_test(instructions: TestInstructions, background_tasks: Backgro
 @app.get("/task-status/{task_id}")
 async def get_task_status(task_id: str):
     """Get task execution status."""
-    if task_id not in task_storage:
+    task_info = await task_storage.get(task_id)
+    if task_info is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    task_info = task_storage[task_id]
     return {
         "task_id": task_id,
         "status": task_info["status"],
@@ -910,84 +1716,98 @@ async def get_task_status(task_id: str):
         "error": task_info.get("error")
     }
 
+def stored_results(task_info: dict) -> dict:
+    """Results of a finished task, or 410 once its payload has been evicted."""
+    results = task_info.get("results")
+    if results is None:
+        raise HTTPException(status_code=410, detail="Task results are no longer held in memory")
+    return results
+
 @app.get("/task-results/{task_id}")
 async def get_task_results(task_id: str):
     """Get task execution results."""
-    if task_id not in task_storage:
+    task_info = await task_storage.get(task_id)
+    if task_info is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task_info = task_storage[task_id]
-    
     if task_info["status"] not in ["completed", "failed"]:
         raise HTTPException(status_code=400, detail=f"Task is still {task_info['status']}")
     
-    return task_info.get("results", {})
+    return stored_results(task_info)
+
+@app.get("/task-results/{task_id}/full")
+async def get_full_task_results(task_id: str):
+    """Stream the full execution log (every step record, screenshot paths, debug info)."""
+    task_info = await task_storage.get(task_id)
+    if task_info is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    log_file = stored_results(task_info).get("log_file")
+    if not log_file or not Path(log_file).exists():
+        raise HTTPException(status_code=404, detail="No execution log for this task")
+    
+    return FileResponse(log_file, media_type="application/x-ndjson")
 
 @app.post("/analyze-results/{task_id}")
 async def analyze_results(task_id: str):
     """Analyze task execution results."""
-    if task_id not in task_storage:
+    task_info = await task_storage.get(task_id)
+    if task_info is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task_info = task_storage[task_id]
-    
     if task_info["status"] != "completed":
         raise HTTPException(status_code=400, detail="Task must be completed before analysis")
     
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
     
+    # Get execution results and original instructions
+    execution_results = stored_results(task_info)
+    original_instructions = task_info.get("instructions") or {}
+    if isinstance(original_instructions, BaseModel):
+        original_instructions = original_instructions.model_dump()
+    
     try:
-        # Create the Agno agent for analysis
-        analyzer_agent = Agent(
-            model=Gemini(id="gemini-2.0-flash", api_key=GEMINI_API_KEY),
-            tools=[ResultsAnalyzer()],
-            instructions=[
-                "You are a website testing analysis expert.",
-                "Your role is to analyze browser automation results and provide comprehensive reports.",
-                "Use the AnalyzeResults tool to examine execution outcomes.",
-                "Provide detailed findings, compliance checks, and recommendations.",
-                "Generate clear, actionable insights from the test execution data."
-            ],
-            markdown=True,
-            show_tool_calls=True,
-        )
-        
-        # Get execution results and original instructions
-        execution_results = task_info.get("results", {})
-        original_instructions = task_info.get("instructions", {})
+        # Reuse the LLM's analysis if these exact results were analyzed before
+        cache_key = analysis_key(execution_results, original_instructions)
+        cached_analysis = await asyncio.to_thread(load_cached_analysis, f"llm_{cache_key}")
+        if cached_analysis is None:
+            analyzer_agent = build_analyzer_agent()
         
-        # Create prompt for analysis
-        prompt = f"""
-        Please analyze the following browser automation execution results:
+            # Create prompt for analysis
+            prompt = f"""
+            Please analyze the following browser automation execution results:
         
-        **Original Instructions:**
-        {json.dumps(original_instructions, indent=2)}
+            **Original Instructions:**
+            {orjson.dumps(original_instructions, option=orjson.OPT_INDENT_2, default=str).decode()}
         
-        **Execution Results:**
-        {json.dumps(execution_results, indent=2)}
+            **Execution Results:**
+            {orjson.dumps(summarize_results(execution_results, original_instructions), option=orjson.OPT_INDENT_2, default=str).decode()}
         
-        Use the AnalyzeResults tool to perform a comprehensive analysis including:
-        1. Execution success/failure assessment
-        2. Compliance with original instructions
-        3. Screenshot capture validation
-        4. Task completion verification
-        5. Recommendations for improvement
+            Use the AnalyzeResults tool to perform a comprehensive analysis including:
+            1. Execution success/failure assessment
+            2. Compliance with original instructions
+            3. Screenshot capture validation
+            4. Task completion verification
+            5. Recommendations for improvement
         
-        Provide a detailed analysis report.
-        """
+            Provide a detailed analysis report.
+            """
         
-        # Run analysis
-        response = analyzer_agent.run(prompt)
+            # Run analysis
+            # Off the event loop: the LLM call and the tool's report write block
+            response = await asyncio.to_thread(analyzer_agent.run, prompt)
+            cached_analysis = {"analysis_content": response.content}
+            await asyncio.to_thread(store_cached_analysis, f"llm_{cache_key}", cached_analysis)
         
         # Store analysis results
         analysis_result = {
             "task_id": task_id,
-            "analysis_content": response.content,
+            "analysis_content": cached_analysis["analysis_content"],
             "timestamp": datetime.now().isoformat()
         }
         
-        task_storage[task_id]["analysis"] = analysis_result
+        await task_storage.update(task_id, analysis=analysis_result)
         
         return analysis_result
         
@@ -997,47 +1817,41 @@ async def analyze_results(task_id: str):
 @app.get("/tasks")
 async def list_tasks():
     """List all tasks and their statuses."""
-    return {
-        "tasks": [
-            {
-                "task_id": task_id,
-                "status": info["status"],
-                "start_time": info.get("start_time"),
-                "end_time": info.get("end_time")
-            }
-            for task_id, info in task_storage.items()
-        ]
-    }
+    return {"tasks": await task_storage.summaries()}
 
 @app.get("/agent-thoughts/{task_id}")
 async def get_agent_thoughts(task_id: str):
     """Get agent thoughts file content for a task."""
-    if task_id not in task_storage:
+    if await task_storage.get(task_id) is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    try:
-        # Look for agent thoughts file
-        thoughts_file_pattern = f"agent_thoughts_{task_id}.txt"
-        thoughts_file = None
-        
-        # Search in logs directory
-        logs_dir = Path("./operation_logs")
-        for file_path in logs_dir.glob(f"*{thoughts_file_pattern}*"):
-            thoughts_file = file_path
-            break
-        
-        if not thoughts_file or not thoughts_file.exists():
-            return "No agent thoughts file found for this task."
-        
-        # Read and return file content
-        with open(thoughts_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        return content
+    def find_thoughts_file() -> Optional[Path]:
+        # A running task's logger may still hold thoughts in its buffer
+        for agent_logger in list(_agent_loggers):
+            if agent_logger.task_id == task_id:
+                agent_logger.flush()
         
+        # AgentLogger always writes to this exact name; only scan the
+        # directory for differently named legacy files when it's missing
+        thoughts_file_pattern = f"agent_thoughts_{task_id}.txt"
+        thoughts_file = logs_dir / thoughts_file_pattern
+        if thoughts_file.exists():
+            return thoughts_file
+        return next(logs_dir.glob(f"*{thoughts_file_pattern}*"), None)
+    
+    try:
+        thoughts_file = await asyncio.to_thread(find_thoughts_file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading agent thoughts: {str(e)}")
+    
+    if not thoughts_file:
+        return PlainTextResponse("No agent thoughts file found for this task.")
+    
+    # Sent straight from disk as plain text
+    return FileResponse(thoughts_file, media_type="text/plain")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # uvicorn[standard] provides uvloop and httptools; "auto" falls back to
+    # asyncio/h11 where they're unavailable (e.g. uvloop on Windows)
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto", http="auto") 
\ No newline at end of file
@@ -20,7 +20,6 @@ interface ExecutionStep {
   result: string;
   timestamp: string;
   screenshot_url?: string;
-  screenshot?: string;
 }
 
 interface ExecutionResult {
@@ -29,9 +28,7 @@ interface ExecutionResult {
   timestamp: string;
   task_details: any;
   execution_steps: ExecutionStep[];
-  screenshots: string[];
   screenshot_urls: string[];
-  full_conversation: any[];
   error?: string;
   log_file?: string;
   detailed_log_file?: string;
@@ -410,7 +407,7 @@ function App() {
                   </div>
                   <div className="bg-gray-50 p-4 rounded-lg text-center">
                     <div className="text-2xl font-bold text-indigo-600 mb-1">
-                      {executionResult.full_conversation?.length || 0}
+                      {executionResult.execution_steps?.filter(step => step.action !== 'N/A').length || 0}
                     </div>
                     <div className="text-sm text-gray-600">AI Messages</div>
                   </div>
@@ -491,19 +488,19 @@ function App() {
                 )}
 
                 {/* AI Conversation */}
-                {executionResult.full_conversation && executionResult.full_conversation.length > 0 && (
+                {executionResult.execution_steps?.some(step => step.action !== 'N/A') && (
                   <div className="mb-6">
                     <h4 className="text-md font-semibold text-gray-900 mb-3">💬 AI Conversation</h4>
                     <div className="bg-gray-50 p-4 rounded-lg max-h-64 overflow-y-auto">
-                      {executionResult.full_conversation.map((conv, index) => (
+                      {executionResult.execution_steps.filter(step => step.action !== 'N/A').map((step, index) => (
                         <div key={index} className="mb-2 p-2 bg-white rounded border">
                           <div className="flex justify-between items-start">
-                            <span className="text-xs font-medium text-blue-600">Step {conv.step}</span>
+                            <span className="text-xs font-medium text-blue-600">Step {step.step_number}</span>
                             <span className="text-xs text-gray-500">
-                              {new Date(conv.timestamp).toLocaleTimeString()}
+                              {new Date(step.timestamp).toLocaleTimeString()}
                             </span>
                           </div>
-                          <div className="text-sm text-gray-800 mt-1">{conv.model_output}</div>
+                          <div className="text-sm text-gray-800 mt-1">{step.action}</div>
                         </div>
                       ))}
                     </div>
@@ -0,0 +1,57 @@
+import json
+import time
+import sqlite3
+import hashlib
+import unicodedata
+from collections import namedtuple
+from pathlib import Path
+from typing import Optional
+
+# Stand-in for an agno RunResponse when the answer comes from the cache
+CachedResponse = namedtuple("CachedResponse", ["content"])
+
+
+def hash_request(inputs: dict, model_id: str) -> str:
+    """Key for an LLM request: its canonical JSON inputs plus the model id."""
+    canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+    canonical = unicodedata.normalize('NFC', canonical).strip()
+    digest = hashlib.sha256()
+    digest.update(model_id.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(canonical.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """Exact-match cache of LLM responses in a SQLite database."""
+
+    def __init__(self, db_path: Path, ttl_seconds: int = 7 * 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response BLOB, ts REAL, model TEXT)"
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text, or None on miss or expiry."""
+        row = self.conn.execute("SELECT response, ts FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        response, ts = row
+        if time.time() - ts > self.ttl_seconds:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.conn.commit()
+            return None
+        return response.decode('utf-8')
+
+    def put(self, key: str, response: str, model_id: str):
+        """Store a response text under key."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, ts, model) VALUES (?, ?, ?, ?)",
+            (key, response.encode('utf-8'), time.time(), model_id)
+        )
+        self.conn.commit()
@@ -0,0 +1,116 @@
+import os
+import re
+import time
+import hashlib
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+# Attributes and markup that change between loads of the same page, as a
+# single alternation so the DOM is scanned once rather than once per pattern
+_VOLATILE_DOM = re.compile('|'.join([
+    r'<!--.*?-->',
+    r'<script\b[^>]*>.*?</script>',
+    r'\s(?:nonce|data-[a-z0-9-]+)="[^"]*"',
+    r'\sid="[^"]*[0-9a-f]{8,}[^"]*"',
+    r'\b\d{10,}\b',
+]), re.DOTALL | re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+_PUNCTUATION = re.compile(r'[^\w\s@./:-]')
+
+
+def normalize_dom(dom: str) -> str:
+    """Strip ids, nonces, timestamps and comments so identical pages hash the same."""
+    return _WHITESPACE.sub(' ', _VOLATILE_DOM.sub('', dom)).strip()
+
+
+def normalize_task(task_description: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a task description."""
+    text = unicodedata.normalize('NFKC', task_description).lower()
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def page_fingerprint(dom: str) -> str:
+    """Hash of the normalized initial page."""
+    return hashlib.sha256(normalize_dom(dom).encode('utf-8')).hexdigest()
+
+
+def fingerprint(task_description: str, target_url: str, page: str, screenshots=()) -> str:
+    """Cache key for a task run against a page with the given page_fingerprint().
+
+    screenshots is the (step_description, filename) pairs the task must
+    capture; they are part of what the agent is asked to do, so a plan
+    recorded for other screenshot requirements must not be replayed.
+    """
+    digest = hashlib.sha256()
+    digest.update(page.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_task(task_description).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(target_url.strip().encode('utf-8'))
+    for step_description, filename in screenshots:
+        digest.update(b'\0')
+        digest.update(normalize_task(step_description).encode('utf-8'))
+        digest.update(b'\1')
+        digest.update(filename.strip().encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PlanCache:
+    """On-disk cache of successful browser-use agent histories, replayed without LLM calls."""
+
+    def __init__(self, cache_dir: Path, ttl_seconds: int = 7 * 24 * 3600, max_bytes: int = 100 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the path of a cached plan, or None on miss or expiry."""
+        path = self._path(key)
+        try:
+            age = time.time() - path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+        if age > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+
+        # Touch so LRU eviction keeps recently used plans
+        os.utime(path)
+        return path
+
+    def put(self, key: str, history) -> Path:
+        """Atomically persist an AgentHistoryList as the plan for this key."""
+        path = self._path(key)
+        tmp_path = path.with_suffix('.tmp')
+        history.save_to_file(tmp_path)
+        os.replace(tmp_path, path)
+        self._evict()
+        return path
+
+    def _evict(self):
+        """Drop expired plans, then least recently used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,13 @@
+import os
+from pathlib import Path
+
+
+def write_screenshot_file(path: Path, data: bytes):
+    """Write screenshot bytes straight to a file descriptor, without a buffered writer."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)